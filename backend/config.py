@@ -16,6 +16,20 @@ class Settings(BaseSettings):
     # CORS Configuration
     allowed_origins: str = "http://localhost:3000,http://localhost:5500,http://127.0.0.1:5500,http://127.0.0.1:3000"
     
+    # Order Events Configuration
+    order_events_change_stream: bool = False
+    sse_keepalive_seconds: int = 15
+    # Open event streams never finish on their own, so cap how long shutdown waits for them
+    graceful_shutdown_seconds: int = 5
+    
+    # Image Variant Configuration (paths relative to the backend directory)
+    image_source_dir: str = ".."
+    image_cache_dir: str = "image_cache"
+    
+    # Related Products Configuration
+    related_products_k: int = 10
+    related_products_rebuild_seconds: int = 3600
+    
     class Config:
         env_file = ".env"
         case_sensitive = False
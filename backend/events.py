@@ -0,0 +1,173 @@
+from typing import Dict, Iterable, Optional, Set
+from collections import defaultdict
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import CollectionInvalid, OperationFailure
+from models import Order
+import asyncio
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+BRIDGE_RETRY_MIN_SECONDS = 1
+BRIDGE_RETRY_MAX_SECONDS = 30
+
+# MongoDB error code when a resume token has aged out of the oplog
+CHANGE_STREAM_HISTORY_LOST = 286
+
+
+class OrderEventHub:
+    """In-process pub/sub hub for order events"""
+
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self.bridged = False
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+
+    def subscribe(self, order_ids: Iterable[str]) -> asyncio.Queue:
+        """Register a queue that receives events for the given orders"""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        for order_id in order_ids:
+            self._subscribers[order_id].add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue, order_ids: Iterable[str]):
+        """Remove a queue registered with subscribe()"""
+        for order_id in order_ids:
+            queues = self._subscribers.get(order_id)
+            if queues is None:
+                continue
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[order_id]
+
+    def publish(self, event_type: str, order_id: str, order: Optional[Order] = None):
+        """Deliver an event to every subscriber of the order"""
+        queues = self._subscribers.get(order_id)
+        if not queues:
+            return
+
+        event = {
+            "type": event_type,
+            "orderId": order_id,
+            "order": order.dict() if order else None
+        }
+        for queue in queues:
+            # Slow consumers drop their oldest event rather than blocking writers
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    def publish_local(self, event_type: str, order_id: str, order: Optional[Order] = None):
+        """Publish an event from an API write in this process.
+
+        When the change stream bridge is running it already delivers every
+        write, so local publishing is skipped to avoid duplicate events.
+        """
+        if not self.bridged:
+            self.publish(event_type, order_id, order)
+
+    def close(self):
+        """Signal all open streams to finish"""
+        for queues in self._subscribers.values():
+            for queue in queues:
+                if queue.full():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+        self._subscribers.clear()
+
+
+def format_sse(event: dict) -> str:
+    """Format an event as a server-sent events message"""
+    data = json.dumps(event, default=str)
+    return f"event: {event['type']}\ndata: {data}\n\n"
+
+
+async def enable_order_pre_images(db: AsyncIOMotorDatabase):
+    """Record pre-images on orders so change streams can report deleted orders.
+
+    Requires MongoDB 6.0+.
+    """
+    options = {"changeStreamPreAndPostImages": {"enabled": True}}
+    try:
+        await db.create_collection("orders", **options)
+    except CollectionInvalid:
+        # Already exists (possibly created by another worker just now)
+        await db.command("collMod", "orders", **options)
+
+
+async def watch_order_changes(db: AsyncIOMotorDatabase, hub: OrderEventHub):
+    """Forward MongoDB change stream events on orders to the hub.
+
+    Requires a replica set. Lets every worker see writes made by the others.
+    Dropped connections and primary elections are retried with backoff,
+    resuming after the last change seen so no event is lost or repeated.
+    """
+    try:
+        await enable_order_pre_images(db)
+    except Exception as e:
+        logger.error(f"Failed to enable order pre-images, deletes will not be streamed: {e}")
+
+    operation_types = {
+        "insert": "order.created",
+        "update": "order.updated",
+        "replace": "order.updated",
+        "delete": "order.deleted",
+    }
+
+    hub.bridged = True
+    resume_token = None
+    started = False
+    delay = BRIDGE_RETRY_MIN_SECONDS
+    try:
+        while True:
+            try:
+                async with db.orders.watch(
+                    full_document="updateLookup",
+                    full_document_before_change="whenAvailable",
+                    resume_after=resume_token
+                ) as stream:
+                    logger.info("Order change stream bridge " + ("resumed" if started else "started"))
+                    started = True
+                    delay = BRIDGE_RETRY_MIN_SECONDS
+                    async for change in stream:
+                        resume_token = change["_id"]
+                        event_type = operation_types.get(change["operationType"])
+                        if event_type is None:
+                            continue
+
+                        document = change.get("fullDocument") or change.get("fullDocumentBeforeChange")
+                        if not document:
+                            logger.debug(f"Skipping {change['operationType']} change without order document")
+                            continue
+
+                        try:
+                            order = Order(**document) if event_type != "order.deleted" else None
+                        except Exception as e:
+                            logger.error(f"Skipping invalid order in change stream: {e}")
+                            continue
+                        hub.publish(event_type, document["id"], order)
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                if not started:
+                    # Not a transient failure, e.g. MongoDB is not a replica set
+                    logger.error(f"Order change stream bridge could not start: {e}")
+                    return
+                if e.code == CHANGE_STREAM_HISTORY_LOST:
+                    logger.warning("Order change stream history lost, some events were missed")
+                    resume_token = None
+                else:
+                    logger.warning(f"Order change stream interrupted: {e}")
+            except Exception as e:
+                logger.warning(f"Order change stream interrupted: {e}")
+
+            logger.info(f"Retrying order change stream in {delay}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, BRIDGE_RETRY_MAX_SECONDS)
+    finally:
+        hub.bridged = False
+
+
+# Global hub instance
+order_events = OrderEventHub()
@@ -0,0 +1,215 @@
+"""
+Product image variant pipeline
+
+Generates resized WebP (and AVIF, when available) copies of product images
+into a content-addressed cache directory.
+"""
+from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from PIL import Image
+from config import settings
+from models import ImageSource, ImageVariant
+import hashlib
+import logging
+import multiprocessing
+import os
+import re
+import tempfile
+
+try:
+    import pillow_avif  # noqa: F401 - registers the AVIF plugin with Pillow
+except ImportError:
+    pass
+
+logger = logging.getLogger(__name__)
+
+# Bump when the encoding settings change so cached files are regenerated
+PIPELINE_VERSION = "1"
+
+VARIANT_WIDTHS = (200, 400, 800)
+
+# Ordered by preference: browsers pick the first <source> they support
+VARIANT_FORMATS = {
+    "avif": {"mime": "image/avif", "options": {"quality": 50}},
+    "webp": {"mime": "image/webp", "options": {"quality": 80, "method": 6}},
+}
+
+VARIANT_URL_PREFIX = "images/variants"
+
+VARIANT_FILENAME = re.compile(r"^[0-9a-f]{24}-\d+w\.(avif|webp)$")
+
+BACKEND_DIR = Path(__file__).parent
+
+
+def get_source_dir() -> Path:
+    """Directory that product image paths are relative to"""
+    return (BACKEND_DIR / settings.image_source_dir).resolve()
+
+
+def get_cache_dir() -> Path:
+    """Directory holding generated variants"""
+    return (BACKEND_DIR / settings.image_cache_dir).resolve()
+
+
+def get_supported_formats() -> List[str]:
+    """Variant formats the installed Pillow can encode"""
+    extensions = Image.registered_extensions()
+    return [fmt for fmt in VARIANT_FORMATS if f".{fmt}" in extensions and extensions[f".{fmt}"] in Image.SAVE]
+
+
+def _write_atomic(image: Image.Image, target: Path, fmt: str):
+    """Save an image so readers never see a partial file.
+
+    Jobs for identical images share target names, so each write goes to its
+    own temp file and the last rename wins with identical content.
+    """
+    fd, tmp = tempfile.mkstemp(dir=target.parent, prefix=f".{target.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            image.save(f, format=fmt.upper(), **VARIANT_FORMATS[fmt]["options"])
+        os.replace(tmp, target)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def _plan_variants(source: str, formats: List[str]) -> List[Tuple[str, int, str]]:
+    """List the (format, width, filename) variants of one image.
+
+    Only the image header is read, not the pixel data.
+    """
+    data = Path(source).read_bytes()
+    digest = hashlib.sha256(data + PIPELINE_VERSION.encode()).hexdigest()[:24]
+    with Image.open(source) as original:
+        original_width = original.width
+
+    # Never upscale: widths beyond the original collapse to the original width
+    widths = sorted({min(width, original_width) for width in VARIANT_WIDTHS})
+    return [(fmt, width, f"{digest}-{width}w.{fmt}") for width in widths for fmt in formats]
+
+
+def _is_cached(variants: List[Tuple[str, int, str]], cache_dir: str) -> bool:
+    """Whether every planned variant already exists in the cache"""
+    return all((Path(cache_dir) / filename).exists() for _, _, filename in variants)
+
+
+def _render_variants(source: str, cache_dir: str, formats: List[str]) -> List[Tuple[str, int, str]]:
+    """Render every missing variant of one image. Usually runs in a worker process.
+
+    Returns (format, width, filename) tuples.
+    """
+    variants = _plan_variants(source, formats)
+    if _is_cached(variants, cache_dir):
+        return variants
+
+    cache_path = Path(cache_dir)
+    with Image.open(source) as original:
+        original.load()
+        image = original.convert("RGBA" if original.mode in ("RGBA", "LA", "P") else "RGB")
+
+        resized = {}
+        for fmt, width, filename in variants:
+            target = cache_path / filename
+            if target.exists():
+                continue
+            if width not in resized:
+                height = round(image.height * width / image.width)
+                resized[width] = image.resize((width, height), Image.LANCZOS)
+            _write_atomic(resized[width], target, fmt)
+    return variants
+
+
+def _to_sources(variants: List[Tuple[str, int, str]]) -> List[ImageSource]:
+    """Group rendered variants into srcset-ready sources"""
+    sources = []
+    for fmt, spec in VARIANT_FORMATS.items():
+        matching = sorted((width, filename) for f, width, filename in variants if f == fmt)
+        if matching:
+            sources.append(ImageSource(
+                type=spec["mime"],
+                variants=[
+                    ImageVariant(url=f"{VARIANT_URL_PREFIX}/{filename}", width=width)
+                    for width, filename in matching
+                ]
+            ))
+    return sources
+
+
+def build_image_variants(images: List[str], max_workers: Optional[int] = None) -> Dict[str, List[ImageSource]]:
+    """Generate variants for product image paths, in a process pool when
+    there is more than one.
+
+    Returns a mapping of image path to its sources. Images that are missing
+    or fail to decode are left out.
+    """
+    source_dir = get_source_dir()
+    cache_dir = get_cache_dir()
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    formats = get_supported_formats()
+
+    jobs = {}
+    for image in dict.fromkeys(images):
+        source = source_dir / image
+        if source.is_file():
+            jobs[image] = str(source)
+        else:
+            logger.warning(f"Image not found, skipping variants: {source}")
+
+    results = {}
+
+    # Cache hits are resolved here so fully cached runs never start a pool
+    for image, source in list(jobs.items()):
+        try:
+            variants = _plan_variants(source, formats)
+        except Exception as e:
+            logger.error(f"Error generating variants for {image}: {e}")
+            del jobs[image]
+            continue
+        if _is_cached(variants, str(cache_dir)):
+            results[image] = _to_sources(variants)
+            del jobs[image]
+
+    if len(jobs) == 1:
+        # A pool is not worth starting for one image (e.g. POST /products)
+        image, source = next(iter(jobs.items()))
+        try:
+            results[image] = _to_sources(_render_variants(source, str(cache_dir), formats))
+        except Exception as e:
+            logger.error(f"Error generating variants for {image}: {e}")
+    elif jobs:
+        # Spawn rather than fork: callers run inside the threaded API server
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            futures = {
+                image: executor.submit(_render_variants, source, str(cache_dir), formats)
+                for image, source in jobs.items()
+            }
+            for image, future in futures.items():
+                try:
+                    results[image] = _to_sources(future.result())
+                except Exception as e:
+                    logger.error(f"Error generating variants for {image}: {e}")
+
+    logger.info(f"Generated image variants for {len(results)} images ({', '.join(formats)})")
+    return results
+
+
+def attach_image_variants(products: List[dict]) -> List[dict]:
+    """Add imageVariants to product dicts in place"""
+    variants = build_image_variants([product["image"] for product in products])
+    for product in products:
+        sources = variants.get(product["image"])
+        if sources:
+            product["imageVariants"] = [source.dict() for source in sources]
+    return products
+
+
+def get_variant_path(filename: str) -> Optional[Path]:
+    """Resolve a variant filename to its cached file, if it exists"""
+    if not VARIANT_FILENAME.match(filename):
+        return None
+    path = get_cache_dir() / filename
+    return path if path.is_file() else None
@@ -6,6 +6,8 @@ import json
 from pathlib import Path
 from motor.motor_asyncio import AsyncIOMotorClient
 from config import settings
+from images import attach_image_variants
+from events import enable_order_pre_images
 
 
 async def init_database():
@@ -45,6 +47,11 @@ async def init_database():
         with open(products_file, 'r') as f:
             products = json.load(f)
         
+        # Generate image variants
+        attach_image_variants(products)
+        variant_count = sum(1 for product in products if product.get("imageVariants"))
+        print(f"🖼️  Generated image variants for {variant_count} products")
+        
         # Insert products
         if products:
             result = await db.products.insert_many(products)
@@ -56,6 +63,10 @@ async def init_database():
         await db.orders.create_index("orderTime")
         print("✅ Created database indexes")
         
+        # Let change streams report the order behind each delete
+        await enable_order_pre_images(db)
+        print("✅ Enabled order pre-images for change streams")
+        
         print("\n🎉 Database initialization complete!")
         print(f"📍 API endpoint: http://{settings.host}:{settings.port}")
         print(f"📖 Documentation: http://{settings.host}:{settings.port}/docs")
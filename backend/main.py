@@ -1,6 +1,10 @@
-from fastapi import FastAPI, HTTPException, status
+from fastapi import FastAPI, HTTPException, Query, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from contextlib import asynccontextmanager
+from typing import List
+import asyncio
 import logging
 import json
 from pathlib import Path
@@ -9,6 +13,9 @@ from config import settings
 from database import MongoDB, get_db
 from models import Product, ProductCreate, Order, OrderCreate
 from services import ProductService, OrderService
+from events import order_events, format_sse, watch_order_changes
+from images import VARIANT_FORMATS, get_variant_path
+from recommendations import related_products, rebuild_periodically
 
 # Configure logging
 logging.basicConfig(
@@ -47,6 +54,25 @@ async def seed_products():
         logger.error(f"Error seeding products: {e}")
 
 
+async def refresh_image_variants():
+    """Make sure this instance's image cache holds every stored variant"""
+    try:
+        product_service = ProductService(get_db())
+        updated = await product_service.refresh_image_variants()
+        if updated:
+            logger.info(f"Updated image variants for {updated} products")
+    except Exception as e:
+        logger.error(f"Error refreshing image variants: {e}")
+
+
+async def build_related_products():
+    """Build the related products index from order history"""
+    try:
+        await related_products.rebuild(get_db())
+    except Exception as e:
+        logger.error(f"Error building related products index: {e}")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan events"""
@@ -54,12 +80,25 @@ async def lifespan(app: FastAPI):
     logger.info("Starting Bazaar Baba API...")
     await MongoDB.connect_db()
     await seed_products()
+    await refresh_image_variants()
+    await build_related_products()
+    
+    background_tasks = []
+    if settings.order_events_change_stream:
+        background_tasks.append(asyncio.create_task(watch_order_changes(get_db(), order_events)))
+    if settings.related_products_rebuild_seconds > 0:
+        background_tasks.append(asyncio.create_task(
+            rebuild_periodically(get_db(), related_products, settings.related_products_rebuild_seconds)
+        ))
     logger.info("API startup complete")
     
     yield
     
     # Shutdown
     logger.info("Shutting down API...")
+    order_events.close()
+    for task in background_tasks:
+        task.cancel()
     await MongoDB.close_db()
     logger.info("API shutdown complete")
 
@@ -156,6 +195,35 @@ async def get_product(product_id: str):
         )
 
 
+@app.get("/products/{product_id}/related", response_model=list[Product], tags=["Products"])
+async def get_related_products(product_id: str, limit: int = Query(default=4, ge=1, le=20)):
+    """Get products frequently bought together with a product"""
+    try:
+        db = get_db()
+        product_service = ProductService(db)
+        related_ids = related_products.get_related(product_id, limit)
+        
+        # Fetch the product itself alongside its related products in one query
+        products = await product_service.get_products_by_ids([product_id] + related_ids)
+        products_by_id = {product.id: product for product in products}
+        
+        if product_id not in products_by_id:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Product with id {product_id} not found"
+            )
+        
+        return [products_by_id[related_id] for related_id in related_ids if related_id in products_by_id]
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in get_related_products: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to fetch related products"
+        )
+
+
 @app.post("/products", response_model=Product, tags=["Products"], status_code=status.HTTP_201_CREATED)
 async def create_product(product: ProductCreate):
     """Create a new product"""
@@ -183,6 +251,73 @@ async def create_product(product: ProductCreate):
         )
 
 
+# ============= Image Variants =============
+
+@app.get("/images/variants/{filename}", tags=["Products"])
+async def get_image_variant(filename: str):
+    """Serve a cached product image variant"""
+    path = get_variant_path(filename)
+    if not path:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Image variant {filename} not found"
+        )
+    
+    # Filenames are content-addressed, so a URL never changes content
+    return FileResponse(
+        path,
+        media_type=VARIANT_FORMATS[path.suffix[1:]]["mime"],
+        headers={"Cache-Control": "public, max-age=31536000, immutable"}
+    )
+
+
+# ============= Order Events =============
+
+MAX_STREAMED_ORDERS = 50
+
+
+async def stream_order_events(request: Request, queue: asyncio.Queue, order_ids: List[str], snapshot: List[Order]):
+    """Yield SSE messages for the given orders until the client disconnects"""
+    try:
+        for order in snapshot:
+            yield format_sse({"type": "order.snapshot", "orderId": order.id, "order": order.dict()})
+        
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=settings.sse_keepalive_seconds)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": keepalive\n\n"
+                continue
+            
+            if event is None:
+                break
+            yield format_sse(event)
+    finally:
+        order_events.unsubscribe(queue, order_ids)
+
+
+def order_events_response(
+    request: Request, queue: asyncio.Queue, order_ids: List[str], snapshot: List[Order]
+) -> StreamingResponse:
+    """Build a streaming response for order events.
+
+    The queue must be subscribed before the snapshot is read so no event is
+    missed in between.
+    """
+    return StreamingResponse(
+        stream_order_events(request, queue, order_ids, snapshot),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        },
+        # Also unsubscribe if the client leaves before the stream starts
+        background=BackgroundTask(order_events.unsubscribe, queue, order_ids)
+    )
+
+
 # ============= Order Endpoints =============
 
 @app.get("/orders", response_model=list[Order], tags=["Orders"])
@@ -201,6 +336,46 @@ async def get_orders():
         )
 
 
+@app.get("/orders/events", tags=["Orders"])
+async def get_orders_events(request: Request, ids: List[str] = Query(...)):
+    """Stream status updates for several orders as server-sent events"""
+    order_ids = list(dict.fromkeys(ids))
+    if len(order_ids) > MAX_STREAMED_ORDERS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_STREAMED_ORDERS} orders can be streamed at once"
+        )
+    
+    queue = order_events.subscribe(order_ids)
+    try:
+        db = get_db()
+        order_service = OrderService(db)
+        snapshot = await order_service.get_orders_by_ids(order_ids)
+        
+        if not snapshot:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="None of the requested orders were found"
+            )
+    except HTTPException:
+        order_events.unsubscribe(queue, order_ids)
+        raise
+    except Exception as e:
+        order_events.unsubscribe(queue, order_ids)
+        logger.error(f"Error in get_orders_events: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to open order event stream"
+        )
+    
+    # Only keep streaming orders that exist
+    found_ids = {order.id for order in snapshot}
+    order_events.unsubscribe(queue, [order_id for order_id in order_ids if order_id not in found_ids])
+    order_ids = [order_id for order_id in order_ids if order_id in found_ids]
+    
+    return order_events_response(request, queue, order_ids, snapshot)
+
+
 @app.get("/orders/{order_id}", response_model=Order, tags=["Orders"])
 async def get_order(order_id: str):
     """Get a specific order by ID"""
@@ -226,6 +401,34 @@ async def get_order(order_id: str):
         )
 
 
+@app.get("/orders/{order_id}/events", tags=["Orders"])
+async def get_order_events(request: Request, order_id: str):
+    """Stream status updates for an order as server-sent events"""
+    queue = order_events.subscribe([order_id])
+    try:
+        db = get_db()
+        order_service = OrderService(db)
+        order = await order_service.get_order_by_id(order_id)
+        
+        if not order:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Order with id {order_id} not found"
+            )
+    except HTTPException:
+        order_events.unsubscribe(queue, [order_id])
+        raise
+    except Exception as e:
+        order_events.unsubscribe(queue, [order_id])
+        logger.error(f"Error in get_order_events: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to open order event stream"
+        )
+    
+    return order_events_response(request, queue, [order_id], [order])
+
+
 @app.post("/orders", response_model=Order, tags=["Orders"], status_code=status.HTTP_201_CREATED)
 async def create_order(order: OrderCreate):
     """Create a new order"""
@@ -234,6 +437,8 @@ async def create_order(order: OrderCreate):
         order_service = OrderService(db)
         new_order = await order_service.create_order(order)
         logger.info(f"Order created: {new_order.id}")
+        order_events.publish_local("order.created", new_order.id, new_order)
+        related_products.add_order(new_order)
         return new_order
     except Exception as e:
         logger.error(f"Error in create_order: {e}")
@@ -250,13 +455,16 @@ async def delete_order(order_id: str):
         db = get_db()
         order_service = OrderService(db)
         
-        success = await order_service.delete_order(order_id)
+        order = await order_service.get_order_by_id(order_id)
+        success = order is not None and await order_service.delete_order(order_id)
         if not success:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Order with id {order_id} not found"
             )
         
+        order_events.publish_local("order.deleted", order_id)
+        related_products.remove_order(order)
         return {"message": f"Order {order_id} deleted successfully"}
     except HTTPException:
         raise
@@ -274,5 +482,6 @@ if __name__ == "__main__":
         "main:app",
         host=settings.host,
         port=settings.port,
-        reload=True
+        reload=True,
+        timeout_graceful_shutdown=settings.graceful_shutdown_seconds
     )
@@ -36,6 +36,18 @@ class ProductColor(BaseModel):
     hex: str
 
 
+class ImageVariant(BaseModel):
+    """Resized copy of a product image"""
+    url: str
+    width: int
+
+
+class ImageSource(BaseModel):
+    """Image variants of one format, ready for a <source> srcset"""
+    type: str
+    variants: List[ImageVariant]
+
+
 class Product(BaseModel):
     """Product model"""
     id: str
@@ -51,6 +63,7 @@ class Product(BaseModel):
     colors: Optional[List[ProductColor]] = None
     instructionsLink: Optional[str] = None
     warrantyLink: Optional[str] = None
+    imageVariants: Optional[List[ImageSource]] = None
     
     class Config:
         populate_by_name = True
@@ -0,0 +1,269 @@
+"""
+"Frequently bought together" recommendations
+
+Keeps an item-to-item co-occurrence index built from order history. Every
+product keeps its top-k co-purchased products so lookups never aggregate.
+
+Full pair counts are still needed to update the top-k lists exactly as
+orders come and go. They are kept as CSR arrays from the last rebuild plus
+a small delta of changes since then, which the next rebuild folds in.
+"""
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from datetime import datetime, timedelta
+from itertools import permutations
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from config import settings
+from models import Order
+import asyncio
+import heapq
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_CLOCK_MARGIN = timedelta(minutes=1)
+
+
+class CooccurrenceCounts:
+    """Pair counts in CSR form: row i holds the products bought with product i"""
+
+    def __init__(self, product_ids: np.ndarray, indptr: np.ndarray, indices: np.ndarray, counts: np.ndarray):
+        self.product_ids = product_ids
+        self.indptr = indptr
+        self.indices = indices
+        self.counts = counts
+        self._codes = {product_id: code for code, product_id in enumerate(product_ids.tolist())}
+
+    @classmethod
+    def empty(cls) -> "CooccurrenceCounts":
+        return cls(
+            np.empty(0, dtype=object), np.zeros(1, dtype=np.int64),
+            np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32)
+        )
+
+    def __len__(self) -> int:
+        """Number of products with at least one co-purchase"""
+        return int(np.count_nonzero(np.diff(self.indptr)))
+
+    def row(self, product_id: str) -> Dict[str, int]:
+        """Counts of the products bought together with one product"""
+        code = self._codes.get(product_id)
+        if code is None:
+            return {}
+        start, end = self.indptr[code], self.indptr[code + 1]
+        return dict(zip(
+            self.product_ids[self.indices[start:end]].tolist(),
+            self.counts[start:end].tolist()
+        ))
+
+
+def compute_cooccurrence(baskets: List[List[str]], k: int) -> Tuple[CooccurrenceCounts, Dict[str, List[str]]]:
+    """Count, for every pair of products, the orders containing both.
+
+    Returns the pair counts and each product's top-k related products,
+    ranked by count with ties broken by product ID.
+    """
+    lengths = np.fromiter((len(basket) for basket in baskets), dtype=np.int64, count=len(baskets))
+    if not lengths.sum():
+        return CooccurrenceCounts.empty(), {}
+
+    # Encode products as integer codes in ID order and drop repeats within a basket
+    vocabulary: Dict[str, int] = {}
+    codes = np.fromiter(
+        (vocabulary.setdefault(product_id, len(vocabulary)) for basket in baskets for product_id in basket),
+        dtype=np.int64, count=int(lengths.sum())
+    )
+    product_ids = np.array(sorted(vocabulary), dtype=object)
+    size = len(product_ids)
+    ranks = np.empty(size, dtype=np.int64)
+    ranks[np.argsort(np.array(list(vocabulary), dtype=object))] = np.arange(size)
+    codes = ranks[codes]
+    basket_of = np.repeat(np.arange(len(baskets), dtype=np.int64), lengths)
+    entries = np.unique(basket_of * size + codes)
+    basket_of, codes = np.divmod(entries, size)
+
+    # Pair every entry with every entry of its basket: entry e is repeated
+    # once per item in its basket, against that basket's items in order
+    starts = np.flatnonzero(np.r_[True, basket_of[1:] != basket_of[:-1]])
+    sizes = np.diff(np.r_[starts, len(codes)])
+    entry_sizes = np.repeat(sizes, sizes)
+    entry_starts = np.repeat(starts, sizes)
+    total = entry_sizes.sum()
+    offsets = np.arange(total) - np.repeat(np.cumsum(entry_sizes) - entry_sizes, entry_sizes)
+    left = np.repeat(codes, entry_sizes)
+    right = codes[np.repeat(entry_starts, entry_sizes) + offsets]
+    distinct = left != right
+    left, right = left[distinct], right[distinct]
+    if not len(left):
+        return CooccurrenceCounts.empty(), {}
+
+    keys, counts = np.unique(left * size + right, return_counts=True)
+    rows, cols = np.divmod(keys, size)
+
+    # keys are sorted by row, so each row's pairs are contiguous
+    row_starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+    row_ends = np.r_[row_starts[1:], len(rows)]
+    cooccurrence = CooccurrenceCounts(
+        product_ids,
+        np.r_[0, np.cumsum(np.bincount(rows, minlength=size))],
+        cols.astype(np.int32),
+        counts.astype(np.int32)
+    )
+
+    # Top-k per row: order by row, count descending, then product ID
+    order = np.lexsort((cols, -counts, rows))
+    ranked_rows = rows[order]
+    rank = np.arange(len(order)) - np.repeat(row_starts, row_ends - row_starts)
+    keep = rank < k
+    top: Dict[str, List[str]] = {}
+    for row, col in zip(ranked_rows[keep].tolist(), cols[order][keep].tolist()):
+        top.setdefault(product_ids[row], []).append(product_ids[col])
+    return cooccurrence, top
+
+
+class RelatedProductsIndex:
+    """Sparse top-k co-occurrence index over order history"""
+
+    def __init__(self, k: int = 10):
+        self.k = k
+        self._counts = CooccurrenceCounts.empty()
+        # Pair count changes since the last rebuild
+        self._delta: Dict[str, Dict[str, int]] = {}
+        self._top: Dict[str, List[str]] = {}
+        # Orders created before this are in the counts; newer ones only if added here
+        self._counted_before: Optional[datetime] = None
+        self._added_ids: Set[str] = set()
+        # Changes that arrive while a rebuild runs, replayed onto its result
+        self._pending: Optional[List[Tuple[Order, int]]] = None
+
+    def _row(self, product_id: str) -> Dict[str, int]:
+        """Current counts for one product: rebuilt counts plus the delta"""
+        row = self._counts.row(product_id)
+        for related_id, change in self._delta.get(product_id, {}).items():
+            count = row.get(related_id, 0) + change
+            if count > 0:
+                row[related_id] = count
+            else:
+                row.pop(related_id, None)
+        return row
+
+    def _refresh(self, product_id: str):
+        """Recompute the top-k list for one product"""
+        row = self._row(product_id)
+        if not row:
+            self._top.pop(product_id, None)
+            return
+        # Ties are broken by product ID so results are stable
+        ranked: List[Tuple[str, int]] = heapq.nsmallest(
+            self.k, row.items(), key=lambda item: (-item[1], item[0])
+        )
+        self._top[product_id] = [related_id for related_id, _ in ranked]
+
+    def _apply(self, product_ids: Iterable[str], delta: int):
+        """Add delta to every pair count in one basket"""
+        items = set(product_ids)
+        for i, j in permutations(items, 2):
+            row = self._delta.setdefault(i, {})
+            change = row.get(j, 0) + delta
+            if change:
+                row[j] = change
+            else:
+                row.pop(j, None)
+        for product_id in items:
+            if not self._delta.get(product_id):
+                self._delta.pop(product_id, None)
+            self._refresh(product_id)
+
+    def _is_counted(self, order: Order) -> bool:
+        """Whether an order's pairs are in the index"""
+        if order.id in self._added_ids:
+            return True
+        if self._counted_before is None:
+            return False
+        # Orders without a timestamp predate created_at and are always rebuilt
+        return order.created_at is None or order.created_at < self._counted_before
+
+    def add_order(self, order: Order):
+        """Update the index with a newly created order"""
+        if self._pending is not None:
+            self._pending.append((order, 1))
+        if not self._is_counted(order):
+            self._added_ids.add(order.id)
+            self._apply((item.productId for item in order.products), 1)
+
+    def remove_order(self, order: Order):
+        """Update the index after an order is deleted.
+
+        Orders this index never counted (e.g. created through another worker
+        since the last rebuild) are left for the next rebuild to drop.
+        """
+        if self._pending is not None:
+            self._pending.append((order, -1))
+        if self._is_counted(order):
+            self._added_ids.discard(order.id)
+            self._apply((item.productId for item in order.products), -1)
+
+    def get_related(self, product_id: str, limit: Optional[int] = None) -> List[str]:
+        """IDs of the products most often bought with the given product"""
+        related = self._top.get(product_id, [])
+        return related[:limit] if limit else list(related)
+
+    async def rebuild(self, db: AsyncIOMotorDatabase):
+        """Rebuild the index from every order in the database.
+
+        Orders created or deleted while the rebuild runs are recorded and
+        replayed onto the new counts. Whether the snapshot already saw each
+        order is decided by its ID, so nothing is counted twice.
+        """
+        # created_at is stamped before the insert commits, so back off a
+        # little: orders near the boundary are treated as not yet counted
+        counted_before = datetime.utcnow() - SNAPSHOT_CLOCK_MARGIN
+        self._pending = []
+        try:
+            cursor = db.orders.find({}, {"id": 1, "created_at": 1, "products.productId": 1, "_id": 0})
+            orders = await cursor.to_list(length=None)
+            snapshot_ids = {order["id"] for order in orders}
+            # Snapshot orders inside the margin are tracked by ID instead
+            recent_ids = {
+                order["id"] for order in orders
+                if order.get("created_at") and order["created_at"] >= counted_before
+            }
+            baskets = [[item["productId"] for item in order.get("products", [])] for order in orders]
+
+            counts, top = await asyncio.get_running_loop().run_in_executor(
+                None, compute_cooccurrence, baskets, self.k
+            )
+            pending, self._pending = self._pending, None
+            self._counts, self._top, self._delta = counts, top, {}
+            self._counted_before, self._added_ids = counted_before, recent_ids
+
+            for order, delta in pending:
+                in_snapshot = order.id in snapshot_ids
+                if delta > 0:
+                    # Orders the snapshot already saw are marked counted, not re-added
+                    if not in_snapshot:
+                        self._apply((item.productId for item in order.products), 1)
+                    self._added_ids.add(order.id)
+                elif in_snapshot or order.id in self._added_ids:
+                    self._added_ids.discard(order.id)
+                    self._apply((item.productId for item in order.products), -1)
+        finally:
+            self._pending = None
+        logger.info(f"Built related products index from {len(baskets)} orders ({len(counts)} products)")
+
+
+async def rebuild_periodically(db: AsyncIOMotorDatabase, index: RelatedProductsIndex, interval: int):
+    """Rebuild the index on a fixed interval.
+
+    Picks up orders written by other workers, which only update their own index.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await index.rebuild(db)
+        except Exception as e:
+            logger.error(f"Error rebuilding related products index: {e}")
+
+
+# Global index instance
+related_products = RelatedProductsIndex(k=settings.related_products_k)
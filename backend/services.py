@@ -2,6 +2,8 @@ from typing import List, Optional
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from models import Product, ProductCreate, Order, OrderCreate, OrderInDB
 from datetime import datetime
+from images import attach_image_variants
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -34,10 +36,21 @@ class ProductService:
             logger.error(f"Error fetching product {product_id}: {e}")
             return None
     
+    async def get_products_by_ids(self, product_ids: List[str]) -> List[Product]:
+        """Get the products matching a list of IDs"""
+        try:
+            cursor = self.collection.find({"id": {"$in": product_ids}})
+            products = await cursor.to_list(length=None)
+            return [Product(**product) for product in products]
+        except Exception as e:
+            logger.error(f"Error fetching products {product_ids}: {e}")
+            raise
+    
     async def create_product(self, product: ProductCreate) -> Product:
         """Create a new product"""
         try:
             product_dict = product.dict()
+            await asyncio.get_running_loop().run_in_executor(None, attach_image_variants, [product_dict])
             await self.collection.insert_one(product_dict)
             return Product(**product_dict)
         except Exception as e:
@@ -48,6 +61,7 @@ class ProductService:
         """Bulk insert products"""
         try:
             if products:
+                await asyncio.get_running_loop().run_in_executor(None, attach_image_variants, products)
                 result = await self.collection.insert_many(products)
                 return len(result.inserted_ids)
             return 0
@@ -55,6 +69,32 @@ class ProductService:
             logger.error(f"Error bulk inserting products: {e}")
             raise
     
+    async def refresh_image_variants(self) -> int:
+        """Regenerate image variants for stored products and fix their URLs.
+
+        Returns the number of products whose imageVariants changed.
+        """
+        try:
+            cursor = self.collection.find({}, {"id": 1, "image": 1, "imageVariants": 1, "_id": 0})
+            products = await cursor.to_list(length=None)
+            stored = {product["id"]: product.pop("imageVariants", None) for product in products}
+            
+            await asyncio.get_running_loop().run_in_executor(None, attach_image_variants, products)
+            
+            updated = 0
+            for product in products:
+                variants = product.get("imageVariants")
+                if variants == stored[product["id"]]:
+                    continue
+                # Drop variants that can no longer be generated so clients fall back to the image
+                update = {"$set": {"imageVariants": variants}} if variants else {"$unset": {"imageVariants": ""}}
+                await self.collection.update_one({"id": product["id"]}, update)
+                updated += 1
+            return updated
+        except Exception as e:
+            logger.error(f"Error refreshing image variants: {e}")
+            raise
+    
     async def delete_all_products(self):
         """Delete all products (for reseeding)"""
         try:
@@ -92,6 +132,16 @@ class OrderService:
             logger.error(f"Error fetching order {order_id}: {e}")
             return None
     
+    async def get_orders_by_ids(self, order_ids: List[str]) -> List[Order]:
+        """Get the orders matching a list of IDs"""
+        try:
+            cursor = self.collection.find({"id": {"$in": order_ids}})
+            orders = await cursor.to_list(length=None)
+            return [Order(**order) for order in orders]
+        except Exception as e:
+            logger.error(f"Error fetching orders {order_ids}: {e}")
+            raise
+    
     async def create_order(self, order: OrderCreate) -> Order:
         """Create a new order"""
         try:
@@ -61,8 +61,10 @@ export const config = {
   endpoints: {
     products: () => `${configs[currentEnv].API_BASE_URL}/products`,
     product: (id) => `${configs[currentEnv].API_BASE_URL}/products/${id}`,
+    relatedProducts: (id) => `${configs[currentEnv].API_BASE_URL}/products/${id}/related`,
     orders: () => `${configs[currentEnv].API_BASE_URL}/orders`,
     order: (id) => `${configs[currentEnv].API_BASE_URL}/orders/${id}`,
+    orderEvents: (id) => `${configs[currentEnv].API_BASE_URL}/orders/${id}/events`,
     health: () => `${configs[currentEnv].API_BASE_URL}/health`
   },
   
@@ -106,3 +106,32 @@ export async function getProductById(productId) {
     return null;
   }
 }
+
+/**
+ * Fetch products frequently bought together with a product
+ */
+export async function getRelatedProducts(productId) {
+  try {
+    config.debug('Fetching related products:', productId);
+    
+    const response = await fetch(config.endpoints.relatedProducts(productId), {
+      method: 'GET',
+      headers: {
+        'Content-Type': 'application/json'
+      },
+      signal: AbortSignal.timeout(config.API_TIMEOUT)
+    });
+    
+    if (!response.ok) {
+      throw new Error(`HTTP ${response.status}: Failed to fetch related products`);
+    }
+    
+    const data = await response.json();
+    config.log(`Loaded ${data.length} related products`);
+    return data;
+    
+  } catch (error) {
+    config.error('Error loading related products:', error.message);
+    return [];
+  }
+}
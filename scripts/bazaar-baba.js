@@ -1,6 +1,7 @@
 import { cart, addToCart, getCartQuantity } from '../data/cart.js';
 import { products, loadProducts } from '../data/products.js';
 import { formatCurrency } from './utils/money.js';
+import { productImageHTML } from './utils/images.js';
 import { searchProductsWithScore } from './utils/search.js';
 import { config } from '../config/config.js';
 import { 
@@ -55,7 +56,7 @@ async function renderProductsGrid(filteredProducts = null) {
         <div class="product-container fade-in">
           <div class="product-image-container">
             <a href="product-details.html?productId=${product.id}">
-              <img class="product-image" src="${product.image}">
+              ${productImageHTML(product, 'product-image', '180px')}
             </a>
             <button class="add-to-cart-button js-add-to-cart"
               data-product-id="${product.id}">
@@ -1,5 +1,7 @@
-import { products, loadProducts } from '../data/products.js';
+import { products, loadProducts, getRelatedProducts } from '../data/products.js';
 import { addToCart, cart } from '../data/cart.js';
+import { formatCurrency } from './utils/money.js';
+import { productImageHTML } from './utils/images.js';
 let selectedColor = null;
 let selectedSize = null;
 let currentProduct = null;
@@ -42,6 +44,24 @@ async function initProductPage() {
   renderColorOptions(product);
   renderSizeOptions(product);
   initInteractivity(product);
+  renderRelatedProducts(product);
+}
+async function renderRelatedProducts(product) {
+  const section = document.querySelector('.js-related-section');
+  const grid = document.querySelector('.js-related-products');
+  if (!section || !grid) return;
+  const relatedProducts = await getRelatedProducts(product.id);
+  if (!relatedProducts.length) return;
+  grid.innerHTML = relatedProducts.map(related => `
+    <a class="related-product" href="product-details.html?productId=${related.id}">
+      <div class="related-product-image-container">
+        ${productImageHTML(related, 'related-product-image', '160px')}
+      </div>
+      <div class="related-product-name">${related.name}</div>
+      <div class="related-product-price">$${formatCurrency(related.priceCents)}</div>
+    </a>
+  `).join('');
+  section.style.display = 'block';
 }
 function updateCartQuantity() {
   let cartQuantity = 0;
@@ -2,6 +2,7 @@ import { loadProducts, getProduct } from '../data/products.js';
 import { getOrders } from '../data/orders.js';
 import dayjs from 'https://unpkg.com/supersimpledev@8.5.0/dayjs/esm/index.js';
 import { cart } from '../data/cart.js';
+import { config } from '../config/config.js';
 const params = new URLSearchParams(window.location.search);
 const orderId = params.get('orderId');
 updateCartQuantity();
@@ -9,6 +10,7 @@ updateHomeHeader();
 loadTrackingPage();
 let currentOrder = null;
 let updateInterval = null;
+let orderEvents = null;
 async function loadTrackingPage() {
   await loadProducts();
   const orders = await getOrders();
@@ -25,6 +27,30 @@ async function loadTrackingPage() {
     updateProgressBar();
   }, 5000);
   updateProgressBar();
+  subscribeToOrderEvents();
+}
+function subscribeToOrderEvents() {
+  if (!window.EventSource) return;
+  orderEvents = new EventSource(config.endpoints.orderEvents(orderId));
+  const handleOrderUpdate = (event) => {
+    const data = JSON.parse(event.data);
+    if (!data.order) return;
+    currentOrder = data.order;
+    renderTrackingUI();
+    updateProgressBar();
+  };
+  orderEvents.addEventListener('order.snapshot', handleOrderUpdate);
+  orderEvents.addEventListener('order.updated', handleOrderUpdate);
+  orderEvents.addEventListener('order.deleted', () => {
+    orderEvents.close();
+    clearInterval(updateInterval);
+    document.querySelector('.js-order-tracking').innerHTML = `
+      <p>This order has been cancelled. <a href="orders.html">Back to orders</a></p>
+    `;
+  });
+  orderEvents.onerror = () => {
+    config.debug('Order event stream interrupted, reconnecting');
+  };
 }
 function renderTrackingUI() {
   const deliveryDate = dayjs(currentOrder.orderTime)
@@ -175,4 +201,7 @@ window.addEventListener('beforeunload', () => {
   if (updateInterval) {
     clearInterval(updateInterval);
   }
+  if (orderEvents) {
+    orderEvents.close();
+  }
 });
@@ -0,0 +1,24 @@
+import { config } from '../../config/config.js';
+
+/**
+ * Build a srcset string from backend image variants
+ */
+export function buildSrcset(source) {
+  return source.variants
+    .map(variant => `${config.API_BASE_URL}/${variant.url} ${variant.width}w`)
+    .join(', ');
+}
+
+/**
+ * Render a product image, using responsive variants when available
+ */
+export function productImageHTML(product, className, sizes) {
+  const img = `<img class="${className}" src="${product.image}" loading="lazy">`;
+  if (!product.imageVariants?.length) {
+    return img;
+  }
+  const sources = product.imageVariants
+    .map(source => `<source type="${source.type}" srcset="${buildSrcset(source)}" sizes="${sizes}">`)
+    .join('');
+  return `<picture>${sources}${img}</picture>`;
+}
@@ -0,0 +1,63 @@
+import { buildSrcset, productImageHTML } from '../scripts/utils/images.js';
+import { config } from '../config/config.js';
+
+describe('test suite: buildSrcset', () => {
+  it('lists every variant with its width, prefixed with the API base URL', () => {
+    const source = {
+      type: 'image/webp',
+      variants: [
+        { url: 'images/variants/abc-200w.webp', width: 200 },
+        { url: 'images/variants/abc-400w.webp', width: 400 }
+      ]
+    };
+    expect(buildSrcset(source)).toEqual(
+      `${config.API_BASE_URL}/images/variants/abc-200w.webp 200w, ` +
+      `${config.API_BASE_URL}/images/variants/abc-400w.webp 400w`
+    );
+  });
+});
+
+describe('test suite: productImageHTML', () => {
+  it('renders a plain img when the product has no variants', () => {
+    const product = { image: 'images/products/backpack.jpg' };
+    const html = productImageHTML(product, 'product-image', '180px');
+    expect(html).toEqual(
+      '<img class="product-image" src="images/products/backpack.jpg" loading="lazy">'
+    );
+  });
+
+  it('renders a plain img when the variant list is empty', () => {
+    const product = { image: 'images/products/backpack.jpg', imageVariants: [] };
+    const html = productImageHTML(product, 'product-image', '180px');
+    expect(html).not.toContain('<picture>');
+  });
+
+  it('renders a picture with one source per format before the fallback img', () => {
+    const product = {
+      image: 'images/products/backpack.jpg',
+      imageVariants: [
+        { type: 'image/avif', variants: [{ url: 'images/variants/abc-200w.avif', width: 200 }] },
+        { type: 'image/webp', variants: [{ url: 'images/variants/abc-200w.webp', width: 200 }] }
+      ]
+    };
+    const container = document.createElement('div');
+    container.innerHTML = productImageHTML(product, 'product-image', '180px');
+
+    const picture = container.querySelector('picture');
+    expect(picture).not.toBeNull();
+
+    const sources = picture.querySelectorAll('source');
+    expect(sources.length).toEqual(2);
+    expect(sources[0].getAttribute('type')).toEqual('image/avif');
+    expect(sources[0].getAttribute('srcset')).toEqual(
+      `${config.API_BASE_URL}/images/variants/abc-200w.avif 200w`
+    );
+    expect(sources[1].getAttribute('type')).toEqual('image/webp');
+    expect(sources[0].getAttribute('sizes')).toEqual('180px');
+
+    const img = picture.lastElementChild;
+    expect(img.tagName).toEqual('IMG');
+    expect(img.className).toEqual('product-image');
+    expect(img.getAttribute('src')).toEqual('images/products/backpack.jpg');
+  });
+});